@@ -1,7 +1,10 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import plotly.graph_objects as go
+
+from crc_model import (
+    GENE_NAMES, CUTOFF_VALUE, REF_GENE, GLOBAL_CSS, CARD_HIGH, CARD_LOW, FOOTER,
+    compute_risk, build_surv_fig, build_bar_fig, build_details, score_csv
+)
 
 # ==========================================
 # 0. 全局样式 (CSS)
@@ -12,31 +15,13 @@ st.set_page_config(
     layout="wide"
 )
 
-st.markdown("""
-    <style>
-    html, body, [class*="css"] { font-size: 18px !important; }
-    h1 { font-size: 3rem !important; }
-    h2 { font-size: 2.2rem !important; }
-    h3 { font-size: 1.8rem !important; }
-    .result-card-score { font-size: 3.5rem !important; font-weight: bold; }
-    .stNumberInput label { font-size: 1.1rem !important; font-weight: 600; }
-    </style>
-    """, unsafe_allow_html=True)
-
-# ==========================================
-# 1. 模型参数
-# ==========================================
-COEFFICIENTS = {
-    "TCEAL4": 0.3364594, "ACTR3B": -0.4104630, "ORAI3":  0.2523666,
-    "PRIM1":  -0.2529674, "LEMD1":  0.2133200, "INHBB":  0.1491095
-}
-CUTOFF_VALUE = 0.5739
-REF_GENE = "EMC7"
+# Streamlit 每次重跑都会清除未重新输出的元素，因此样式需每次注入
+st.markdown(GLOBAL_CSS, unsafe_allow_html=True)
 
 # ==========================================
-# 2. 侧边栏
+# 1. 侧边栏
 # ==========================================
-with st.sidebar:
+with st.sidebar, st.form("inputs"):
     st.header("Input Feature Values")
     st.caption("Enter Log2 transformed gene expression")
     st.markdown("---")
@@ -44,40 +29,38 @@ with st.sidebar:
     val_ref = st.number_input(f"{REF_GENE} Value", value=6.90, step=0.1, format="%.2f")
     st.markdown("---")
     st.markdown("**Target Genes Expression**")
-    inputs = {}
-    for gene in COEFFICIENTS.keys():
-        inputs[gene] = st.number_input(f"{gene}", value=10.00, step=0.1, format="%.2f")
+    raw = np.empty(len(GENE_NAMES), dtype=np.float64)
+    for i, name in enumerate(GENE_NAMES):
+        raw[i] = st.number_input(name, value=10.00, step=0.1, format="%.2f")
+    # 表单内的输入仅在提交时才触发重跑
+    predict_btn = st.form_submit_button("🚀 Predict Risk (开始预测)", type="primary", use_container_width=True)
 
 # ==========================================
-# 3. 主界面
+# 2. 主界面
 # ==========================================
 st.title("Predicting CRC Recurrence Risk Using a 6-Gene Signature")
 st.info(f"**Model Type**: LASSO + Stepwise Cox | **Cutoff**: {CUTOFF_VALUE} | **Ref**: {REF_GENE}")
-predict_btn = st.button("🚀 Predict Risk (开始预测)", type="primary", use_container_width=True)
 
 # ==========================================
-# 4. 计算与结果展示
+# 3. 计算与结果展示
 # ==========================================
 if predict_btn:
     st.markdown("---")
     
-    # --- 计算逻辑 ---
-    risk_score = 0
-    calculation_details = []
-    for gene, coef in COEFFICIENTS.items():
-        raw_val = inputs[gene]
-        norm_expr = raw_val - val_ref
-        risk_score += (norm_expr * coef)
-        calculation_details.append({
-            "Gene": gene, "Raw Value": raw_val, 
-            "Norm Value": norm_expr, "Coefficient": coef, 
-            "Contribution": norm_expr * coef
-        })
-    
-    is_high_risk = risk_score > CUTOFF_VALUE
-    risk_level = "High Risk (高风险)" if is_high_risk else "Low Risk (低风险)"
-    risk_color = "#d32f2f" if is_high_risk else "#388e3c"
-    bg_color = "rgba(211, 47, 47, 0.1)" if is_high_risk else "rgba(56, 142, 60, 0.1)"
+    # --- 计算逻辑 (向量化; 输入与上次预测相同时直接复用结果) ---
+    pred_key = (val_ref, *raw.tolist())
+    if st.session_state.get("last_key") == pred_key:
+        risk_score, norm, contrib, fig_surv, fig_bar = st.session_state["last_result"]
+        is_high_risk = risk_score > CUTOFF_VALUE
+    else:
+        risk_score, norm, contrib = compute_risk(raw, val_ref)
+        is_high_risk = risk_score > CUTOFF_VALUE
+        fig_surv = build_surv_fig(is_high_risk)
+        fig_bar = build_bar_fig(is_high_risk)
+        st.session_state["last_key"] = pred_key
+        st.session_state["last_result"] = (risk_score, norm, contrib, fig_surv, fig_bar)
+
+    result_card = CARD_HIGH if is_high_risk else CARD_LOW
 
     # --- 布局 ---
     col_res, col_viz = st.columns([1, 1.4], gap="large")
@@ -85,30 +68,13 @@ if predict_btn:
     # === 左侧栏：结果 ===
     with col_res:
         st.subheader("Prediction Result")
-        st.markdown(f"""
-        <div style="background-color: {bg_color}; padding: 25px; border-radius: 12px; border: 3px solid {risk_color}; text-align: center; margin-bottom: 25px;">
-            <p style="margin:0; color: #555;">Risk Score</p>
-            <h1 class="result-card-score" style="margin:5px 0; color: {risk_color};">{risk_score:.4f}</h1>
-            <hr style="border-top: 2px solid {risk_color}; opacity: 0.3; margin: 15px 0;">
-            <h2 style="margin:0; color: {risk_color};">{risk_level}</h2>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(result_card.format(score=risk_score), unsafe_allow_html=True)
 
-        # 仪表盘
-        max_gauge_val = max(5.0, risk_score + 1.0)
-        fig_gauge = go.Figure(go.Indicator(
-            mode = "gauge+delta", value = risk_score,
-            domain = {'x': [0, 1], 'y': [0, 1]},
-            delta = {'reference': CUTOFF_VALUE, 'increasing': {'color': "red"}, 'decreasing': {'color': "green"}},
-            gauge = {
-                'axis': {'range': [None, max_gauge_val]}, 'bar': {'color': risk_color},
-                'steps': [{'range': [0, CUTOFF_VALUE], 'color': "rgba(56, 142, 60, 0.15)"},
-                          {'range': [CUTOFF_VALUE, max_gauge_val], 'color': "rgba(211, 47, 47, 0.15)"}],
-                'threshold': {'line': {'color': "red", 'width': 4}, 'thickness': 0.75, 'value': CUTOFF_VALUE}
-            }
-        ))
-        fig_gauge.update_layout(height=220, margin=dict(l=20, r=20, t=10, b=10))
-        st.plotly_chart(fig_gauge, use_container_width=True)
+        # 评分与阈值对比 (高于阈值显示为红色)
+        progress_max = max(5.0, risk_score + 1.0)
+        delta_cutoff = risk_score - CUTOFF_VALUE
+        st.metric("Risk Score", f"{risk_score:.4f}", delta=f"{delta_cutoff:+.4f} vs cutoff", delta_color="inverse")
+        st.progress(max(risk_score / progress_max, 0.0), text=f"{risk_score:.2f} / {progress_max:.1f} (cutoff {CUTOFF_VALUE})")
         
         # 临床建议
         st.markdown("#### 💡 Clinical Recommendation")
@@ -121,99 +87,34 @@ if predict_btn:
     with col_viz:
         st.subheader("Survival Analysis & Visualization")
         
-        # --- 1. 数据模拟 (模拟置信区间) ---
-        time_points = np.linspace(0, 60, 61) # 0-60个月
-        
-        # 模拟高/低风险的平均曲线
-        surv_low_mean = np.exp(-0.005 * time_points)
-        surv_high_mean = np.exp(-0.025 * time_points)
-        
-        # 模拟“高风险组”的分布范围 (Confidence Interval)
-        surv_high_upper = surv_high_mean * 1.05 # 上界
-        surv_high_lower = surv_high_mean * 0.90 # 下界
-        
-        # 确定患者曲线 (作为平均线)
-        patient_curve = surv_high_mean if is_high_risk else surv_low_mean
-        patient_color = risk_color
-        
-        # --- 2. 绘制升级版生存曲线 (带阴影带) ---
-        fig_surv = go.Figure()
-        
-        # A. 绘制低风险组参考线 (绿色虚线)
-        fig_surv.add_trace(go.Scatter(
-            x=time_points, y=surv_low_mean, mode='lines', name='Low Risk Group (Avg)',
-            line=dict(color='green', dash='dash', width=2), opacity=0.6
-        ))
-
-        # B. 绘制高风险组 "区域" (红色阴影带) - 解决重叠问题的关键！
-        # 先画下界 (透明线)
-        fig_surv.add_trace(go.Scatter(
-            x=time_points, y=surv_high_lower, mode='lines', line=dict(width=0),
-            showlegend=False, hoverinfo='skip'
-        ))
-        # 再画上界，并填充到下界 (形成带状区域)
-        fig_surv.add_trace(go.Scatter(
-            x=time_points, y=surv_high_upper, mode='lines', line=dict(width=0),
-            fill='tonexty', # 填充到上一条线
-            fillcolor='rgba(211, 47, 47, 0.15)', # 淡淡的红色区域
-            name='High Risk Range (95% CI)',
-            hoverinfo='skip'
-        ))
-
-        # C. 绘制当前患者 (实线)
-        fig_surv.add_trace(go.Scatter(
-            x=time_points, y=patient_curve, mode='lines', name='Current Patient Prediction',
-            line=dict(color=patient_color, width=4) # 加粗实线
-        ))
-
-        fig_surv.update_layout(
-            title="Recurrence-Free Survival (with Group Range)",
-            xaxis_title="Time (Months)", yaxis_title="Probability",
-            yaxis_range=[0, 1.05], template="plotly_white", height=350,
-            legend=dict(orientation="h", y=1.1)
-        )
+        # --- 1. 绘制升级版生存曲线 (带阴影带) ---
         st.plotly_chart(fig_surv, use_container_width=True)
 
-        # --- 3. 新增：关键时间点生存率柱状图 (Bar Chart) ---
+        # --- 2. 新增：关键时间点生存率柱状图 (Bar Chart) ---
         st.markdown("##### 📊 1/3/5-Year Survival Probability")
-        
-        # 提取第12, 36, 60个月的数据点
-        indices = [12, 36, 60]
-        years = ["1-Year", "3-Year", "5-Year"]
-        
-        vals_patient = [patient_curve[i] for i in indices]
-        vals_low_risk_avg = [surv_low_mean[i] for i in indices]
-        
-        fig_bar = go.Figure()
-        
-        # 低风险组柱子
-        fig_bar.add_trace(go.Bar(
-            x=years, y=vals_low_risk_avg, name='Low Risk Avg',
-            marker_color='#a5d6a7', text=[f"{v:.1%}" for v in vals_low_risk_avg],
-            textposition='auto'
-        ))
-        
-        # 患者柱子
-        fig_bar.add_trace(go.Bar(
-            x=years, y=vals_patient, name='Current Patient',
-            marker_color=patient_color, text=[f"{v:.1%}" for v in vals_patient],
-            textposition='auto'
-        ))
-        
-        fig_bar.update_layout(
-            barmode='group', # 分组显示
-            template="plotly_white", height=300,
-            margin=dict(t=30, b=0),
-            yaxis=dict(range=[0, 1.1], title="Survival Probability")
-        )
         st.plotly_chart(fig_bar, use_container_width=True)
 
         # 详细数据折叠
         with st.expander("📝 Calculation Details"):
-             st.dataframe(pd.DataFrame(calculation_details).style.background_gradient(subset=["Contribution"], cmap="RdYlGn_r"))
+             df_details, details_config = build_details(raw, val_ref, norm, contrib)
+             st.dataframe(df_details, column_config=details_config)
+
+# ==========================================
+# 4. 批量预测 (CSV 上传)
+# ==========================================
+with st.expander("📂 Batch Mode (CSV Upload)"):
+    st.caption(f"One patient per row, Log2 expression columns: {REF_GENE}, {', '.join(GENE_NAMES)}")
+    uploaded = st.file_uploader("Upload patient CSV", type="csv")
+    if uploaded is not None:
+        try:
+            df_batch = score_csv(uploaded.getvalue())
+        except ValueError as e:
+            st.error(f"Invalid CSV: {e}")
+        else:
+            st.dataframe(df_batch, column_config={"Risk Score": st.column_config.NumberColumn(format="%.4f")})
 
 # ==========================================
 # 5. 页脚
 # ==========================================
 st.markdown("---")
-st.markdown("<div style='text-align: center; color: #888; font-size: 14px;'>⚠️ Disclaimer: Research use only.</div>", unsafe_allow_html=True)
+st.markdown(FOOTER, unsafe_allow_html=True)
@@ -0,0 +1,235 @@
+import io
+import math
+from collections import namedtuple
+from typing import TYPE_CHECKING, Final
+
+import streamlit as st
+import numpy as np
+import plotly.graph_objects as go
+from numba import njit
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# ==========================================
+# 0. 全局样式 (CSS)
+# ==========================================
+GLOBAL_CSS = """
+    <style>
+    html, body, [class*="css"] { font-size: 18px !important; }
+    h1 { font-size: 3rem !important; }
+    h2 { font-size: 2.2rem !important; }
+    h3 { font-size: 1.8rem !important; }
+    .result-card-score { font-size: 3.5rem !important; font-weight: bold; }
+    .stNumberInput label { font-size: 1.1rem !important; font-weight: 600; }
+    </style>
+    """
+
+# ==========================================
+# 1. 模型参数
+# ==========================================
+# 基因名与系数按位置一一对应 (COEFS 为唯一数据源)
+GENE_NAMES: Final[tuple[str, ...]] = ("TCEAL4", "ACTR3B", "ORAI3", "PRIM1", "LEMD1", "INHBB")
+COEFS: Final[np.ndarray] = np.array([0.3364594, -0.4104630, 0.2523666, -0.2529674, 0.2133200, 0.1491095], dtype=np.float64)
+COEFS.flags.writeable = False # Final 不阻止原地写入, 锁定数组以免与 COEFFICIENTS 不一致
+CUTOFF_VALUE: Final[float] = 0.5739
+REF_GENE: Final[str] = "EMC7"
+
+# 导入时由 COEFS 生成的按基因名访问的系数快照, 仅供调试查看 (如 COEFFICIENTS.TCEAL4)
+Coefs = namedtuple("Coefs", GENE_NAMES)
+COEFFICIENTS: Final[Coefs] = Coefs(*COEFS.tolist())
+
+
+def compute_risk(inputs_arr: np.ndarray, val_ref: float) -> tuple[float, np.ndarray, np.ndarray]:
+    """以参考基因归一化后计算风险评分，返回 (风险评分, 归一化表达, 各基因贡献)。"""
+    norm = inputs_arr - val_ref
+    return float(COEFS @ norm), norm, norm * COEFS
+
+
+@njit(cache=True, fastmath=True)
+def score_batch(expr: np.ndarray, ref: np.ndarray, coefs: np.ndarray) -> np.ndarray:
+    """批量评分：expr 为 (患者数, 基因数) 表达矩阵，ref 为每位患者的参考基因表达。"""
+    n, m = expr.shape
+    out = np.empty(n)
+    for i in range(n):
+        s = 0.0
+        for j in range(m):
+            s += (expr[i, j] - ref[i]) * coefs[j]
+        out[i] = s
+    return out
+
+
+@njit(cache=True)
+def surv_curve(k: float, t: np.ndarray, out: np.ndarray) -> None:
+    """指数生存曲线 exp(-k*t)，原地写入 out。"""
+    for i in range(t.size):
+        out[i] = math.exp(-k * t[i])
+
+
+# 导入时预热 JIT (编译结果缓存到磁盘; surv_curve 在下方生成生存曲线时即完成编译)
+score_batch(np.zeros((1, COEFS.size)), np.zeros(1), COEFS)
+
+
+# 高/低风险配色, 直接以 is_high_risk 为下标: PALETTE[False] 低风险, PALETTE[True] 高风险
+PALETTE = (
+    dict(primary="#388e3c", bg="rgba(56, 142, 60, 0.1)", fill="rgba(56, 142, 60, 0.15)"),
+    dict(primary="#d32f2f", bg="rgba(211, 47, 47, 0.1)", fill="rgba(211, 47, 47, 0.15)"),
+)
+
+# ==========================================
+# 1.1 HTML 模板
+# ==========================================
+# 结果卡片模板 (导入时生成一次, 仅风险评分需要在运行时填充)
+_CARD_TEMPLATE = """
+        <div style="background-color: {bg_color}; padding: 25px; border-radius: 12px; border: 3px solid {risk_color}; text-align: center; margin-bottom: 25px;">
+            <p style="margin:0; color: #555;">Risk Score</p>
+            <h1 class="result-card-score" style="margin:5px 0; color: {risk_color};">{{score:.4f}}</h1>
+            <hr style="border-top: 2px solid {risk_color}; opacity: 0.3; margin: 15px 0;">
+            <h2 style="margin:0; color: {risk_color};">{risk_level}</h2>
+        </div>
+        """
+CARD_HIGH = _CARD_TEMPLATE.format(risk_color=PALETTE[True]["primary"], bg_color=PALETTE[True]["bg"], risk_level="High Risk (高风险)")
+CARD_LOW = _CARD_TEMPLATE.format(risk_color=PALETTE[False]["primary"], bg_color=PALETTE[False]["bg"], risk_level="Low Risk (低风险)")
+
+FOOTER = "<div style='text-align: center; color: #888; font-size: 14px;'>⚠️ Disclaimer: Research use only.</div>"
+
+# 模拟高/低风险组的平均生存曲线 (0-60个月, 每3个月一个点, 与输入无关; float32 足够绘图精度且减小图表体积)
+_TIME_POINTS = np.linspace(0, 60, 21, dtype=np.float32)
+_SURV_LOW = np.empty_like(_TIME_POINTS)
+_SURV_HIGH = np.empty_like(_TIME_POINTS)
+surv_curve(0.005, _TIME_POINTS, _SURV_LOW)
+surv_curve(0.025, _TIME_POINTS, _SURV_HIGH)
+
+# 模拟“高风险组”的分布范围 (Confidence Interval)
+_SURV_HIGH_UPPER = _SURV_HIGH * 1.05 # 上界
+_SURV_HIGH_LOWER = _SURV_HIGH * 0.90 # 下界
+_KEY_MONTHS = np.array([12, 36, 60]) # 1/3/5年
+_KEY_IDX = np.searchsorted(_TIME_POINTS, _KEY_MONTHS)
+assert np.array_equal(_TIME_POINTS[_KEY_IDX], _KEY_MONTHS), "时间网格须包含第12, 36, 60个月"
+
+# 图表布局 (Plotly 构建时会复制, 可安全共享)
+_SURV_LAYOUT = dict(
+    title="Recurrence-Free Survival (with Group Range)",
+    xaxis_title="Time (Months)", yaxis_title="Probability",
+    yaxis_range=[0, 1.05], template="plotly_white", height=350,
+    legend=dict(orientation="h", y=1.1)
+)
+_BAR_LAYOUT = dict(
+    barmode='group', # 分组显示
+    template="plotly_white", height=300,
+    margin=dict(t=30, b=0),
+    yaxis=dict(range=[0, 1.1], title="Survival Probability")
+)
+
+# ==========================================
+# 2. 生存曲线与图表 (缓存)
+# ==========================================
+@st.cache_data
+def build_surv_fig(is_high_risk: bool) -> dict:
+    """生存曲线：低风险组参考线 + 高风险组区间 + 当前患者曲线。"""
+    # 确定患者曲线 (作为平均线)
+    patient_curve = _SURV_HIGH if is_high_risk else _SURV_LOW
+
+    fig_surv = go.Figure(data=[
+        # A. 绘制低风险组参考线 (绿色虚线)
+        go.Scattergl(
+            x=_TIME_POINTS, y=_SURV_LOW, mode='lines', name='Low Risk Group (Avg)',
+            line=dict(color='green', dash='dash', width=2), opacity=0.6
+        ),
+        # B. 绘制高风险组 "区域" (红色阴影带) - 解决重叠问题的关键！
+        # 先画下界 (透明线)
+        go.Scattergl(
+            x=_TIME_POINTS, y=_SURV_HIGH_LOWER, mode='lines', line=dict(width=0),
+            showlegend=False, hoverinfo='skip'
+        ),
+        # 再画上界，并填充到下界 (形成带状区域)
+        go.Scattergl(
+            x=_TIME_POINTS, y=_SURV_HIGH_UPPER, mode='lines', line=dict(width=0),
+            fill='tonexty', # 填充到上一条线
+            fillcolor=PALETTE[True]["fill"], # 淡淡的红色区域
+            name='High Risk Range (95% CI)',
+            hoverinfo='skip'
+        ),
+        # C. 绘制当前患者 (实线)
+        go.Scattergl(
+            x=_TIME_POINTS, y=patient_curve, mode='lines', name='Current Patient Prediction',
+            line=dict(color=PALETTE[is_high_risk]["primary"], width=4) # 加粗实线
+        ),
+    ], layout=_SURV_LAYOUT)
+    return fig_surv.to_dict()
+
+
+@st.cache_data
+def build_bar_fig(is_high_risk: bool) -> dict:
+    """1/3/5年生存率柱状图：当前患者 vs 低风险组平均。"""
+    patient_curve = _SURV_HIGH if is_high_risk else _SURV_LOW
+    patient_color = PALETTE[is_high_risk]["primary"]
+
+    # 提取第12, 36, 60个月的数据点
+    years = ["1-Year", "3-Year", "5-Year"]
+
+    vals_patient = patient_curve[_KEY_IDX]
+    vals_low_risk_avg = _SURV_LOW[_KEY_IDX]
+
+    fig_bar = go.Figure(data=[
+        # 低风险组柱子
+        go.Bar(
+            x=years, y=vals_low_risk_avg, name='Low Risk Avg',
+            marker_color='#a5d6a7', text=[f"{v:.1%}" for v in vals_low_risk_avg],
+            textposition='auto'
+        ),
+        # 患者柱子
+        go.Bar(
+            x=years, y=vals_patient, name='Current Patient',
+            marker_color=patient_color, text=[f"{v:.1%}" for v in vals_patient],
+            textposition='auto'
+        ),
+    ], layout=_BAR_LAYOUT)
+    return fig_bar.to_dict()
+
+
+# 明细表列格式 (由前端渲染, 输入值按录入精度显示)
+_NUMBER_2F = st.column_config.NumberColumn(format="%.2f")
+_NUMBER_4F = st.column_config.NumberColumn(format="%.4f")
+
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def build_details(raw: np.ndarray, val_ref: float, norm: np.ndarray, contrib: np.ndarray) -> tuple["pd.DataFrame", dict]:
+    """计算明细表及其列配置 (前端格式化, 贡献度以进度条 + 红/绿标记显示)。"""
+    import pandas as pd # 延迟导入: 首次预测前的页面加载无需 pandas
+
+    df_details = pd.DataFrame({
+        "Gene": GENE_NAMES, "Raw Value (Log2)": raw,
+        "Ref Value": np.full(len(GENE_NAMES), val_ref, dtype=np.float64),
+        "Norm Value (ΔLog2)": norm, "Coefficient": COEFS,
+        "Contribution": contrib,
+        "Effect": np.select([contrib > 0, contrib < 0], ["🔴 Risk ↑", "🟢 Risk ↓"], "—")
+    }, copy=False)
+    span = float(np.abs(contrib).max()) or 1.0
+    column_config = {
+        "Raw Value (Log2)": _NUMBER_2F, "Ref Value": _NUMBER_2F,
+        "Norm Value (ΔLog2)": _NUMBER_4F, "Coefficient": _NUMBER_4F,
+        "Contribution": st.column_config.ProgressColumn(format="%.4f", min_value=-span, max_value=span),
+    }
+    return df_details, column_config
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def score_csv(csv_bytes: bytes) -> "pd.DataFrame":
+    """批量预测：CSV 每行一位患者, 需含参考基因及 6 个目标基因列, 返回追加评分与风险分层后的表。"""
+    import pandas as pd
+
+    df = pd.read_csv(io.BytesIO(csv_bytes))
+    missing = [c for c in (REF_GENE, *GENE_NAMES) if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    # 与导入时预热的签名一致 (C 连续、可写), 避免首次上传时重新 JIT 编译
+    expr = np.ascontiguousarray(df[list(GENE_NAMES)].to_numpy(dtype=np.float64))
+    ref = df[REF_GENE].to_numpy(dtype=np.float64, copy=True)
+    if not (np.isfinite(expr).all() and np.isfinite(ref).all()):
+        raise ValueError("Expression values must be finite numbers")
+    scores = score_batch(expr, ref, COEFS)
+    return df.assign(**{
+        "Risk Score": scores,
+        "Risk Level": np.where(scores > CUTOFF_VALUE, "High Risk", "Low Risk"),
+    })